@@ -1,8 +1,30 @@
-import json
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
 import re
 from pathlib import Path
-from dotenv import load_dotenv  # noqa: WPS433 – runtime import required before openai
-from openai import OpenAI
+
+import orjson
+from openai import AsyncOpenAI, OpenAI
+
+from Agents.fs_utils import ensure_dir
+from Agents.openai_batch import run_chat_batch
+from Agents.openai_client import astream_completion, shared_async_client, shared_client, stream_completion
+from Agents.playwright_context import load_context_blob
+
+log = logging.getLogger(__name__)
+
+# Matches "= /* ... */;" (optionally with whitespace around the equals sign)
+_PLACEHOLDER_RE = re.compile(r"=\s*/\*.*?\*/;", re.DOTALL)
+
+# Reviewer feedback that carries nothing actionable; revising on it would only burn an LLM round-trip.
+_NOOP_FEEDBACK = {"", "lgtm", "lgtm.", "lgtm!", "looks good", "looks good to me", "no issues", "no issues found"}
+# Word-trigram Jaccard similarity above which feedback counts as a repeat of the previous round (which is
+# still revised on, but with a hint that the previous attempt did not resolve it).
+_FEEDBACK_SIMILARITY_THRESHOLD = 0.9
+_DIGITS_RE = re.compile(r"\d+")
 
 
 class CoderAgentShell:
@@ -11,22 +33,51 @@ class CoderAgentShell:
     repeatedly invoked with reviewer feedback until all tests pass.
     """
 
-    def __init__(self, test_case_json_path: str, output_dir: str, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        test_case_json_path: str,
+        output_dir: str,
+        model: str = "gpt-4o-mini",
+        client: OpenAI | None = None,
+        async_client: AsyncOpenAI | None = None,
+    ):
         """Initialise the agent.
 
         Args:
             test_case_json_path: Path to the JSON file produced by `TestCaseGeneratorAgent`.
             output_dir: Directory where the generated python test file will be written.
             model: Any chat-completion capable OpenAI model name.
+            client: OpenAI client to use; defaults to the process-wide :func:`Agents.openai_client.shared_client`.
+            async_client: Async OpenAI client for the ``a*`` coroutines. Defaults to the per-event-loop
+                :func:`Agents.openai_client.shared_async_client`, configured like *client* if one is given.
+                It must only be used on one event loop.
         """
-        load_dotenv(override=True)  # ensures OPENAI_API_KEY is picked up from the user environment
-        self.openai = OpenAI()
+        self.openai = client or shared_client()  # one pooled client keeps HTTP connections alive across agents
+        # The async pipeline mirrors an injected sync client's settings unless given its own client.
+        self._injected_client = client
+        self._async_client = async_client
 
         self.test_case_json_path = Path(test_case_json_path)
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.output_dir)
         self.model = model
         self.test_cases: dict | None = None
+        # Memoised result of :meth:`_build_static_system`; reset whenever the test cases are reloaded.
+        self._static_system: str | None = None
+        # Whether the last :meth:`_save_code` call actually changed the file on disk.
+        self.code_changed = False
+        # Code last passed to :meth:`_save_code` (written or not) and its BLAKE2b digest, so that consumers
+        # such as the reviewer can use the current version without re-reading the file.
+        self.code: str | None = None
+        self.code_digest: bytes | None = None
+        # Fingerprints of the feedback the previous revision was based on (see :meth:`_is_repeated_feedback`).
+        self._last_feedback_hash: bytes | None = None
+        self._last_feedback_trigrams: set[tuple[str, ...]] = set()
+
+    @property
+    def aopenai(self) -> AsyncOpenAI:
+        """Async client used by the ``a*`` coroutine variants of the public helpers."""
+        return self._async_client or shared_async_client(self._injected_client)
 
     # ---------------------------------------------------------------------
     # Public helpers
@@ -51,24 +102,68 @@ class CoderAgentShell:
         Returns:
             Absolute path to the updated python test file.
         """
-        prev_code_path = self.output_dir / "test_generated.spec.js"
-        prev_code = prev_code_path.read_text() if prev_code_path.exists() else ""
-
-        prompt = (
-            "You are an expert QA automation engineer. Improve the following Playwright test code (JavaScript) so that it "
-            "addresses the feedback below and passes all tests. Return *only* the updated JavaScript code "
-            "— no markdown or commentary.\n\n"  # noqa: E501
-            f"FEEDBACK:\n{feedback}\n\nPREVIOUS_CODE:\n{prev_code}"
-        )
+        if self._is_noop_feedback(feedback):
+            return str(self._keep_previous_code())
 
-        response = self.openai.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        improved_code = response.choices[0].message.content
+        messages = self._build_messages(feedback, repeated=self._is_repeated_feedback(feedback))
+        improved_code = stream_completion(self.openai, model=self.model, messages=messages)
+        improved_code = self._sanitize_code(improved_code)
+        return str(self._save_code(improved_code))
+
+    async def arun(self) -> str:
+        """Coroutine counterpart of :meth:`run` built on :class:`openai.AsyncOpenAI`."""
+        self._load_test_cases()
+        code_str = await self._agenerate_code()
+        code_str = self._sanitize_code(code_str)
+        return str(self._save_code(code_str))
+
+    async def aimprove_code(self, feedback: str) -> str:
+        """Coroutine counterpart of :meth:`improve_code`."""
+        if self._is_noop_feedback(feedback):
+            return str(self._keep_previous_code())
+
+        messages = self._build_messages(feedback, repeated=self._is_repeated_feedback(feedback))
+        improved_code = await astream_completion(self.aopenai, model=self.model, messages=messages)
         improved_code = self._sanitize_code(improved_code)
         return str(self._save_code(improved_code))
 
+    @staticmethod
+    def generate_batch(agents: list[CoderAgentShell], poll_interval: float = 30.0) -> list[str | None]:
+        """Generate the initial test code for many suites through a single OpenAI Batch API job.
+
+        Cheaper (about half the price) than calling :meth:`run` per agent and not bound by the per-minute
+        request limit, but results are only available once the whole batch job has completed.
+
+        Args:
+            agents: Coder agents whose suites should be generated; the first agent's client submits the job.
+            poll_interval: Seconds to wait between two status checks of the batch job.
+
+        Returns:
+            The generated file path per agent (same order as *agents*), or *None* where the request failed.
+        """
+        if not agents:
+            return []
+
+        bodies: dict[str, dict] = {}
+        for idx, agent in enumerate(agents):
+            agent._load_test_cases()
+            bodies[str(idx)] = {
+                "model": agent.model,
+                "messages": agent._build_messages(),
+            }
+
+        results = run_chat_batch(agents[0].openai, bodies, poll_interval=poll_interval)
+
+        paths: list[str | None] = []
+        for idx, agent in enumerate(agents):
+            code_str = results[str(idx)]
+            if code_str is None:
+                log.warning("Batch request for %s failed", agent.test_case_json_path)
+                paths.append(None)
+                continue
+            paths.append(str(agent._save_code(agent._sanitize_code(code_str))))
+        return paths
+
     # ---------------------------------------------------------------------
     # Internal helpers
     # ---------------------------------------------------------------------
@@ -78,98 +173,134 @@ class CoderAgentShell:
         The method is intentionally *private* because it mutates internal state without returning a value.
         It is always followed by a call to :meth:`_generate_code` in the public :meth:`run` wrapper.
         """
-        with self.test_case_json_path.open() as f:
-            self.test_cases = json.load(f)
+        self.test_cases = orjson.loads(self.test_case_json_path.read_bytes())
+        self._static_system = None
 
-    def _build_prompt(self) -> str:
-        """Craft the prompt that instructs the LLM to emit Playwright tests.
+    @staticmethod
+    def _is_noop_feedback(feedback: str) -> bool:
+        """Tell whether *feedback* carries nothing actionable (empty, or a plain "LGTM")."""
+        return " ".join(feedback.lower().split()) in _NOOP_FEEDBACK
 
-        Besides the `TEST_CASES_JSON`, the prompt also injects **selected** helper files from the
-        `context_playwright/` directory so that the generated code is stylistically aligned with the
-        existing suite. Only small, *relevant* files are included to keep token usage reasonable.
+    def _is_repeated_feedback(self, feedback: str) -> bool:
+        """Tell whether *feedback* repeats the feedback the previous revision addressed.
 
-        Returns:
-            The fully assembled prompt ready to be passed to OpenAI.
+        Exact repeats are caught by a BLAKE2b digest of the normalised text; near-repeats (e.g. the same
+        test failure with different timings) by the Jaccard similarity of word trigrams, computed with
+        digit runs masked so that durations, ports and line numbers do not count as changes.
         """
-        json_blob = json.dumps(self.test_cases, indent=2)
-
-        # ------------------------------------------------------------------
-        # Locate the Playwright project context directory.
-        # The folder may live directly under the project root *or* inside a
-        # nested `context/` folder depending on how the repository is laid out.
-        # We resolve the first path that exists to remain backwards compatible
-        # with both structures.
-        # ------------------------------------------------------------------
-        candidate_dirs = [
-            Path(__file__).resolve().parent.parent.parent / "context_playwright",
-            Path(__file__).resolve().parent.parent.parent / "context" / "context_playwright",
-        ]
-
-        context_dir = next((d for d in candidate_dirs if d.exists()), None)
-
-        # --------------------------------------------------------------
-        # Selectively import only *key* Playwright helper files to keep the
-        # prompt size manageable. We purposefully exclude entire test suites
-        # or heavyweight files that do not aid code generation.
-        # --------------------------------------------------------------
-        context_parts: list[str] = []
-        if context_dir:  # pragma: no branch – defensive, should usually exist
-            allowed_base_dirs = {"utils", "globals", "locators"}
-            always_include_files = {"playwright.config.js"}
-
-            for file_path in context_dir.rglob("*"):
-                if not file_path.is_file():
-                    continue
-
-                rel_parts = file_path.relative_to(context_dir).parts
-
-                # Decide whether to include this file.
-                include = (
-                    rel_parts[0] in allowed_base_dirs  # e.g. utils/..., globals/...
-                    or file_path.name in always_include_files
-                )
+        normalized = " ".join(feedback.lower().split())
+        feedback_hash = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+        words = _DIGITS_RE.sub("0", normalized).split()
+        trigrams = set(zip(words, words[1:], words[2:]))
+
+        repeated = feedback_hash == self._last_feedback_hash
+        if not repeated and trigrams and self._last_feedback_trigrams:
+            overlap = len(trigrams & self._last_feedback_trigrams) / len(trigrams | self._last_feedback_trigrams)
+            repeated = overlap >= _FEEDBACK_SIMILARITY_THRESHOLD
+
+        self._last_feedback_hash = feedback_hash
+        self._last_feedback_trigrams = trigrams
+        return repeated
+
+    def _keep_previous_code(self, file_name: str = "test_generated.spec.js") -> Path:
+        """Skip a revision round: leave the previous code in place and report it as unchanged."""
+        output_path = self.output_dir / file_name
+        self.code_changed = False
+        log.info("Feedback is a no-op – keeping %s", output_path)
+        return output_path
 
-                # Additionally filter by file size to avoid extremely large files (>30 KB)
-                include = include and file_path.stat().st_size < 30_000
+    def _build_static_system(self) -> str:
+        """Craft the *immutable* system prompt shared by every generation and revision request.
 
-                if not include:
-                    continue
+        Besides the `TEST_CASES_JSON`, the prompt also injects **selected** helper files from the
+        `context_playwright/` directory so that the generated code is stylistically aligned with the
+        existing suite. Only small, *relevant* files are included to keep token usage reasonable.
 
-                try:
-                    file_content = file_path.read_text(encoding="utf-8", errors="ignore")
-                except Exception:
-                    # Any unreadable file is skipped to avoid breaking the prompt
-                    file_content = ""
+        The text is byte-identical across the review/revise loop so that the provider's prompt cache
+        (OpenAI caches repeated prefixes automatically) can serve it. The largest block – the helper
+        files – comes first to maximise the length of the cached prefix.
 
-                context_parts.append(f"FILE: {file_path.name}\\n{file_content}")
+        Returns:
+            The system message content ready to be passed to OpenAI.
+        """
+        if self._static_system is not None:
+            return self._static_system
+        if self.test_cases is None:
+            self._load_test_cases()
+        json_blob = orjson.dumps(self.test_cases, option=orjson.OPT_INDENT_2).decode()
 
-        context_blob = "\n\n".join(context_parts)
+        context_blob = load_context_blob()
 
-        return (
+        self._static_system = (
             "You are an experienced JavaScript test automation developer specialising in Playwright. "
-            "Write Playwright test code (JavaScript) that fulfils the following test cases (provided as JSON). "
+            "You write and revise Playwright test code (JavaScript) that fulfils the test cases provided below as JSON. "
             "Follow the *exact same structure, fixtures, naming conventions and helper function usage* demonstrated in the `CONTEXT_PLAYWRIGHT_FILES` examples so that the newly generated tests are consistent with the existing suite. "
             "For HTTP requests, use Playwright's built-in APIRequestContext (via the request fixture) or the helper classes provided in the context. Avoid any non-standard dependencies. "
             "Respond with *pure JavaScript code only* – no markdown fences or additional explanation.\n\n"  # noqa: E501
-            f"TEST_CASES_JSON:\n{json_blob}\n\n"
-            f"CONTEXT_PLAYWRIGHT_FILES:\n{context_blob}"
+            f"CONTEXT_PLAYWRIGHT_FILES:\n{context_blob}\n\n"
+            f"TEST_CASES_JSON:\n{json_blob}"
+        )
+        return self._static_system
+
+    def _build_user(self, feedback: str | None = None, prev_code: str | None = None, repeated: bool = False) -> str:
+        """Craft the *per-call* user message: a generation request, or a revision request if *feedback* is given.
+
+        A *repeated* feedback (same failure as last round) adds a hint that the previous fix did not work.
+        """
+        if feedback is None:
+            return "Write Playwright test code (JavaScript) that fulfils all test cases in `TEST_CASES_JSON`."
+
+        hint = ""
+        if repeated:
+            hint = (
+                "Your previous revision did not resolve this feedback – the same problem is still reported. "
+                "Take a different approach rather than repeating the same fix.\n\n"
+            )
+        return (
+            "Improve the following Playwright test code (JavaScript) so that it addresses the feedback below "
+            "and passes all tests. Return *only* the updated JavaScript code — no markdown or commentary.\n\n"  # noqa: E501
+            f"{hint}FEEDBACK:\n{feedback}\n\nPREVIOUS_CODE:\n{prev_code or ''}"
         )
 
+    def _build_messages(self, feedback: str | None = None, repeated: bool = False) -> list[dict]:
+        """Assemble the chat messages: the cacheable system prompt followed by the per-call user message."""
+        prev_code = None
+        if feedback is not None:
+            prev_code_path = self.output_dir / "test_generated.spec.js"
+            prev_code = prev_code_path.read_text() if prev_code_path.exists() else ""
+
+        return [
+            {"role": "system", "content": self._build_static_system()},
+            {"role": "user", "content": self._build_user(feedback, prev_code, repeated)},
+        ]
+
     def _generate_code(self) -> str:
         """Send the prompt to the LLM and return the raw JavaScript code string."""
+        return stream_completion(self.openai, model=self.model, messages=self._build_messages())
 
-        prompt = self._build_prompt()
-        response = self.openai.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        return response.choices[0].message.content
+    async def _agenerate_code(self) -> str:
+        """Coroutine counterpart of :meth:`_generate_code`."""
+        return await astream_completion(self.aopenai, model=self.model, messages=self._build_messages())
 
     def _save_code(self, code_str: str, file_name: str = "test_generated.spec.js"):
-        """Persist the generated python code to *output_dir / file_name* and return that `Path`."""
+        """Persist the generated python code to *output_dir / file_name* and return that `Path`.
+
+        The write is skipped when the file already holds bit-identical content (common when the LLM
+        answers stylistic feedback with the same code); :pyattr:`code_changed` records which case occurred.
+        """
         output_path = Path(self.output_dir) / file_name
-        output_path.write_text(code_str)
-        print(f"Test code written to {output_path}")
+        code_bytes = code_str.encode("utf-8")
+        new_digest = hashlib.blake2b(code_bytes, digest_size=16).digest()
+        self.code = code_str
+        self.code_digest = new_digest
+        if output_path.exists() and hashlib.blake2b(output_path.read_bytes(), digest_size=16).digest() == new_digest:
+            self.code_changed = False
+            log.info("Test code unchanged at %s", output_path)
+            return output_path
+
+        output_path.write_bytes(code_bytes)
+        self.code_changed = True
+        log.info("Test code written to %s", output_path)
         return output_path
 
     # ---------------------------------------------------------------------
@@ -185,7 +316,26 @@ class CoderAgentShell:
 
         with a string literal stub so that the file remains valid JavaScript.
         """
+        return _PLACEHOLDER_RE.sub("= '';// TODO: provide value;", code_str)
+
+
+def run_concurrently(agents: list[CoderAgentShell], requests_per_minute: int = 500) -> list[str]:
+    """Generate the test code for several independent suites at once.
+
+    Every agent's :meth:`CoderAgentShell.arun` is scheduled on a single event loop so that the end-to-end
+    time approaches that of the slowest suite rather than the sum of all of them. Concurrency is capped
+    at ``requests_per_minute // 60`` in-flight requests to stay within the OpenAI rate limit.
+
+    Returns:
+        The generated file paths, in the same order as *agents*.
+    """
+    async def _gather() -> list[str]:
+        semaphore = asyncio.Semaphore(max(1, requests_per_minute // 60))
+
+        async def _run_one(agent: CoderAgentShell) -> str:
+            async with semaphore:
+                return await agent.arun()
+
+        return await asyncio.gather(*(_run_one(agent) for agent in agents))
 
-        # Matches "= /* ... */;" (optionally with whitespace around the equals sign)
-        placeholder_pattern = re.compile(r"=\s*/\*.*?\*/;", re.DOTALL)
-        return placeholder_pattern.sub("= '';// TODO: provide value;", code_str)
+    return asyncio.run(_gather())
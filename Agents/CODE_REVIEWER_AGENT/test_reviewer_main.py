@@ -1,11 +1,37 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import logging
 import subprocess
 import sys
+from collections import deque
 from pathlib import Path
 
-from dotenv import load_dotenv  # noqa: WPS433 – runtime import before openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from Agents.openai_client import astream_completion, shared_async_client, shared_client, stream_completion
+from Agents.playwright_context import load_context_blob
+
+log = logging.getLogger(__name__)
+
+# Number of trailing output lines kept from a test run; plenty of context for the LLM feedback.
+_OUTPUT_TAIL_LINES = 2000
+
+
+@functools.lru_cache(maxsize=None)
+def _find_playwright_bin(start_dir: Path) -> str | None:
+    """Locate the Playwright test runner once per directory: the nearest `node_modules/.bin`.
+
+    ``PATH`` is deliberately not searched: it usually holds the pip ``playwright`` console script (a
+    declared dependency), which is the driver CLI and has no ``test`` runner.
+    """
+    bin_name = "playwright.cmd" if sys.platform == "win32" else "playwright"
+    for directory in (start_dir, *start_dir.parents):
+        candidate = directory / "node_modules" / ".bin" / bin_name
+        if candidate.is_file():
+            return str(candidate)
+    return None
 
 
 class CodeReviewerAgent:
@@ -16,19 +42,55 @@ class CodeReviewerAgent:
     static code review if desired.
     """
 
-    def __init__(self, test_file_path: str | Path, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        test_file_path: str | Path,
+        model: str = "gpt-4o-mini",
+        workers: int | None = None,
+        fully_parallel: bool = False,
+        shard_index: int | None = None,
+        shard_total: int | None = None,
+        client: OpenAI | None = None,
+        async_client: AsyncOpenAI | None = None,
+    ):
+        """Initialise the agent.
+
+        Args:
+            test_file_path: Generated spec (or pytest module) to execute and review.
+            model: Any chat-completion capable OpenAI model name.
+            workers: Playwright worker processes; by default the project's `playwright.config.js` decides.
+            fully_parallel: Also spread the individual `test()` blocks of the spec over the workers. Off by
+                default, since generated API suites often share state between consecutive tests.
+            shard_index: 1-based shard to run when the suite is split across machines (needs *shard_total*).
+            shard_total: Total number of shards the suite is split into.
+            client: OpenAI client to use; defaults to the process-wide :func:`Agents.openai_client.shared_client`.
+            async_client: Async OpenAI client for the ``a*`` coroutines. Defaults to the per-event-loop
+                :func:`Agents.openai_client.shared_async_client`, configured like *client* if one is given.
+                It must only be used on one event loop.
+        """
         self.test_file_path = Path(test_file_path)
         self.working_dir = self.test_file_path.parent
+        self.workers = workers
+        self.fully_parallel = fully_parallel
+        self.shard_index = shard_index
+        self.shard_total = shard_total
 
         # LLM is optional for the MVP but we initialise it for future use
-        load_dotenv(override=True)
-        self.openai = OpenAI()
+        self.openai = client or shared_client()
+        # The async pipeline mirrors an injected sync client's settings unless given its own client.
+        self._injected_client = client
+        self._async_client = async_client
         self.model = model
 
+    @property
+    def aopenai(self) -> AsyncOpenAI:
+        """Async client used by :meth:`areview_code`."""
+        return self._async_client or shared_async_client(self._injected_client)
+
     # ------------------------------------------------------------------
     # Public helpers
     # ------------------------------------------------------------------
-    def review_code(self) -> tuple[bool, str]:
+    def review_code(self, code_text: str | None = None) -> tuple[bool, str]:
         """Run the tests (Python or JavaScript) and return *(passed, feedback)*.
 
         The method automatically detects whether the *generated* tests are a Python
@@ -36,6 +98,10 @@ class CodeReviewerAgent:
         and executes the appropriate runtime command. If the runtime phase passes,
         an optional LLM-powered static code review is performed to catch stylistic
         or best-practice issues that do not show up at execution time.
+
+        Args:
+            code_text: Current content of the test file, if the caller already holds it in memory; saves
+                re-reading the file for the static review.
         """
 
         # ------------------------------------------------------------------
@@ -52,7 +118,9 @@ class CodeReviewerAgent:
         static_feedback = ""
         if passed:
             try:
-                static_feedback = self._static_js_review()
+                if code_text is None:
+                    code_text = self.test_file_path.read_text()
+                static_feedback = self._static_js_review(code_text)
             except Exception as exc:  # noqa: WPS429 – broad except is fine for non-critical path
                 # We never want the static review step to break the pipeline, so we
                 # swallow any exception and just append a minimal error notice.
@@ -65,103 +133,162 @@ class CodeReviewerAgent:
 
         return passed, combined_feedback
 
+    async def areview_code(self, code_text: str | None = None) -> tuple[bool, str]:
+        """Coroutine counterpart of :meth:`review_code`.
+
+        The test run is awaited via :func:`asyncio.create_subprocess_exec` and the static review via
+        :class:`openai.AsyncOpenAI`, so several reviewers can share one event loop. As in the blocking
+        variant, the LLM review only runs once the suite passed; a failing run never pays for it.
+        """
+        if self.test_file_path.suffix in {".js", ".ts"}:
+            passed, runtime_feedback = await self._arun_command(
+                self._playwright_cmd(), "All Playwright tests passed successfully.", cwd=self.working_dir
+            )
+        else:
+            passed, runtime_feedback = await self._arun_command(self._pytest_cmd(), "All Python tests passed successfully.")
+
+        static_feedback = ""
+        if passed:
+            try:
+                if code_text is None:
+                    code_text = self.test_file_path.read_text()
+                static_feedback = await self._astatic_js_review(code_text)
+            except Exception as exc:  # noqa: WPS429 – see review_code
+                static_feedback = f"[Static review failed: {exc}]"
+
+        combined_feedback = runtime_feedback
+        if static_feedback:
+            combined_feedback += "\n\n[Static Review]\n" + static_feedback
+
+        return passed, combined_feedback
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
-    def _run_pytest(self) -> tuple[bool, str]:
-        """Execute `pytest` in a subprocess and capture output."""
-        try:
-            subprocess.check_output(
-                [sys.executable, "-m", "pytest", str(self.working_dir)],
-                stderr=subprocess.STDOUT,
-            )
-            return True, "All Python tests passed successfully."
-        except subprocess.CalledProcessError as exc:  # pragma: no cover – we just capture output
-            return False, exc.output.decode()
+    def _pytest_cmd(self) -> list[str]:
+        """Command line used to run a Python test suite."""
+        return [sys.executable, "-m", "pytest", str(self.working_dir)]
 
-    def _run_playwright(self) -> tuple[bool, str]:
-        """Execute JavaScript Playwright tests via `npx playwright test` and capture output."""
+    def _playwright_cmd(self) -> list[str]:
+        """Command line used to run a JavaScript Playwright spec.
+
+        The locally installed Playwright CLI is invoked directly when it can be found, skipping the
+        package resolution `npx` performs on every run; otherwise we fall back to `npx`.
+        """
+        pw_bin = _find_playwright_bin(self.working_dir.resolve())
+        launcher = [pw_bin] if pw_bin else ["npx", "--yes", "playwright"]  # --yes ensures non-interactive execution
         cmd = [
-            "npx",
-            "--yes",  # ensures non-interactive execution
-            "playwright",
+            *launcher,
             "test",
             str(self.test_file_path),
             "--reporter",
             "line",
         ]
+        # Only override the project's config when explicitly asked to.
+        if self.workers:
+            cmd += ["--workers", str(self.workers)]
+        if self.fully_parallel:
+            cmd.append("--fully-parallel")
+        if self.shard_index and self.shard_total:
+            cmd.append(f"--shard={self.shard_index}/{self.shard_total}")
+        return cmd
+
+    @staticmethod
+    def _run_command(cmd: list[str], success_msg: str, cwd: Path | None = None) -> tuple[bool, str]:
+        """Run *cmd*, log its combined output live (at DEBUG level) and return *(passed, feedback)*.
+
+        Only the last :data:`_OUTPUT_TAIL_LINES` lines are retained for the feedback, which keeps memory
+        flat regardless of how chatty the test run is while still leaving plenty of context for the LLM.
+        """
+        tail: deque[str] = deque(maxlen=_OUTPUT_TAIL_LINES)
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            bufsize=1,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        ) as proc:
+            for line in proc.stdout:
+                log.debug("%s", line.rstrip("\n"))
+                tail.append(line)
+            returncode = proc.wait()
+
+        if returncode == 0:
+            return True, success_msg
+        return False, "".join(tail)
+
+    @staticmethod
+    async def _arun_command(cmd: list[str], success_msg: str, cwd: Path | None = None) -> tuple[bool, str]:
+        """Coroutine counterpart of :meth:`_run_command` built on :func:`asyncio.create_subprocess_exec`."""
+        tail: deque[str] = deque(maxlen=_OUTPUT_TAIL_LINES)
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=cwd,
+        )
+        while line_bytes := await proc.stdout.readline():
+            line = line_bytes.decode("utf-8", "replace")
+            log.debug("%s", line.rstrip("\n"))
+            tail.append(line)
+        returncode = await proc.wait()
+
+        if returncode == 0:
+            return True, success_msg
+        return False, "".join(tail)
+
+    def _run_pytest(self) -> tuple[bool, str]:
+        """Execute `pytest` in a subprocess and capture output."""
+        return self._run_command(self._pytest_cmd(), "All Python tests passed successfully.")
 
-        try:
-            subprocess.check_output(cmd, stderr=subprocess.STDOUT, cwd=self.working_dir)
-            return True, "All Playwright tests passed successfully."
-        except subprocess.CalledProcessError as exc:  # pragma: no cover – we just capture output
-            return False, exc.output.decode()
+    def _run_playwright(self) -> tuple[bool, str]:
+        """Execute JavaScript Playwright tests via `npx playwright test` and capture output."""
+        return self._run_command(
+            self._playwright_cmd(), "All Playwright tests passed successfully.", cwd=self.working_dir
+        )
 
     # ------------------------------------------------------------------
     # LLM static review helpers
     # ------------------------------------------------------------------
-    def _static_js_review(self) -> str:
+    def _static_js_review(self, code_text: str) -> str:
         """Perform an LLM-based static review of the generated JS test file.
 
         The prompt is enriched with the existing Playwright helper files so that the
         model can judge stylistic and architectural consistency.
         """
+        feedback = stream_completion(self.openai, model=self.model, messages=self._build_review_messages(code_text))
+        return feedback.strip()
 
+    async def _astatic_js_review(self, code_text: str) -> str:
+        """Coroutine counterpart of :meth:`_static_js_review`."""
+        feedback = await astream_completion(
+            self.aopenai, model=self.model, messages=self._build_review_messages(code_text)
+        )
+        return feedback.strip()
+
+    def _build_review_messages(self, code_text: str) -> list[dict]:
+        """Assemble the static-review chat messages.
+
+        The reviewer persona and project context form a byte-identical system prompt (eligible for the
+        provider's automatic prefix cache); only the generated spec travels in the user message.
+        """
         context_blob = self._collect_context_playwright()
-        generated_code = self.test_file_path.read_text()
 
-        prompt = (
+        system = (
             "You are a *senior JavaScript/TypeScript QA engineer* specialising in Playwright. "
-            "Review the following Playwright test code for correctness, maintainability and adherence "
+            "Review the Playwright test code you are given for correctness, maintainability and adherence "
             "to best practices **given the project context**. Provide concise, actionable feedback.\n\n"  # noqa: E501
-            f"GENERATED_TEST_CODE:\n{generated_code}\n\n"
             f"CONTEXT_PLAYWRIGHT_FILES:\n{context_blob}"
         )
-
-        response = self.openai.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        return response.choices[0].message.content.strip()
+        user = f"GENERATED_TEST_CODE:\n{code_text}"
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
 
     def _collect_context_playwright(self) -> str:
         """Aggregate the raw content of files in the `context_playwright` directory."""
-        project_root = Path(__file__).resolve().parent.parent.parent
-
-        # Support both `<root>/context_playwright` and `<root>/context/context_playwright` layouts.
-        candidate_dirs = [
-            project_root / "context_playwright",
-            project_root / "context" / "context_playwright",
-        ]
-
-        context_dir = next((d for d in candidate_dirs if d.exists()), None)
-
-        context_parts: list[str] = []
-        if context_dir:  # pragma: no branch – defensive
-            allowed_base_dirs = {"utils", "globals", "locators"}
-            always_include_files = {"playwright.config.js"}
-
-            for file_path in context_dir.rglob("*"):
-                if not file_path.is_file():
-                    continue
-
-                rel_parts = file_path.relative_to(context_dir).parts
-
-                include = (
-                    rel_parts[0] in allowed_base_dirs
-                    or file_path.name in always_include_files
-                )
-
-                include = include and file_path.stat().st_size < 30_000
-
-                if not include:
-                    continue
-
-                try:
-                    content = file_path.read_text(encoding="utf-8", errors="ignore")
-                except Exception:
-                    content = ""
-
-                context_parts.append(f"FILE: {file_path.name}\\n{content}")
-
-        return "\n\n".join(context_parts) 
\ No newline at end of file
+        return load_context_blob()
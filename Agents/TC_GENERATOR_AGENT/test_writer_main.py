@@ -1,3 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import logging
+import time
+from collections.abc import Callable
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import orjson
+from lxml import etree as ET
+from openai import AsyncOpenAI, OpenAI
+
+from Agents.openai_batch import run_chat_batch
+from Agents.openai_client import astream_completion, awarm_up, shared_async_client, shared_client, stream_completion
+
+log = logging.getLogger(__name__)
+
+# Static system prompt of every generation request. Kept byte-identical across runs so that the provider's
+# automatic prompt cache can match the prefix; it is also part of the on-disk cache key.
+_INSTRUCTIONS = """
+You are an experienced QA Engineer. Your job is to write test cases for API endpoints.
+You will receive an XML file (exported from testrail) that contains the test cases for an API endpoint.
+You will need to convert these XML cases into a uniform text format that can be used to automate the test cases.
+The test cases should be written in a way that is easy to understand and easy to automate. JSON format with meaningful key names.
+If there are additional test cases that are not covered by the XML file, you should add them to the test cases.
+"""
+
+# Appended to :data:`_INSTRUCTIONS` when a large export is converted chunk by chunk (see ``agenerate_chunked``).
+_CHUNK_INSTRUCTIONS = """
+You will receive one chunk of a larger export; convert only the test cases it contains.
+Respond with a JSON object with a single key "test_cases" whose value is the list of converted test cases.
+"""
+
+# JSON mode: the API guarantees a syntactically valid JSON object, so no "pure JSON" pleading is needed.
+_JSON_MODE = {"type": "json_object"}
+# Seed of the single retry issued if a response still fails to decode (e.g. cut off at the token limit).
+_RETRY_SEED = 1234
+
+# Appended to :data:`_INSTRUCTIONS` when several exports are converted in one request.
+_COMBINED_INSTRUCTIONS = """
+You will receive several XML files, each wrapped in a <FILE id=N>...</FILE> section. Convert every file separately.
+Respond with a single JSON object whose keys are the file ids (as strings) and whose values are the test cases of that file.
+"""
+
+# Prompt minification for :meth:`TestCaseGeneratorAgent.parse_xml`: TestRail bookkeeping elements (audit
+# trail, internal foreign keys) are dropped with their content, and only these attributes are kept.
+_DROP_TAGS = frozenset({
+    "created_on", "created_by", "updated_on", "updated_by",
+    "suite_id", "section_id", "milestone_id", "template_id", "type_id", "priority_id",
+    "display_order", "estimate_forecast",
+})
+_KEEP_ATTRS = frozenset({"id", "name", "title", "type"})
+
+# In-flight :meth:`TestCaseGeneratorAgent.arun` conversions keyed by (event loop, cache key). Lookup and
+# registration happen without an intervening ``await``, so no lock is needed on the single-threaded loop.
+_inflight: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+
+def _escape_attr(value: str) -> str:
+    """Escape an attribute value the way ``lxml.etree.tostring`` does."""
+    return escape(value, {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"})
+
+
+def _tag_name(elem: ET._Element) -> str:
+    """Serialised tag of *elem*: its local name, prefixed when it lives in a prefixed namespace."""
+    local = ET.QName(elem).localname
+    return f"{elem.prefix}:{local}" if elem.prefix else local
+
+
+def _case_chunks(xml: str, max_cases: int) -> list[str]:
+    """Split the serialised export *xml* into XML snippets of at most *max_cases* ``<case>`` elements each.
+
+    Every snippet keeps the context a case loses when cut out of the tree: it is wrapped in the root
+    element (with the suite name) and in ``<section path="Parent / Child">`` elements naming the sections
+    its cases came from.
+    """
+    root = ET.fromstring(xml)
+    suite_name = root.findtext("name")
+    opening = f'<{root.tag} name="{_escape_attr(suite_name)}">' if suite_name else f"<{root.tag}>"
+    cases = list(root.iter("case"))
+
+    chunks = []
+    for start in range(0, len(cases), max_cases):
+        parts = [opening]
+        current_path = None
+        for case in cases[start:start + max_cases]:
+            path = " / ".join(
+                section.findtext("name", "") for section in reversed(list(case.iterancestors("section")))
+            )
+            if path != current_path:
+                if current_path is not None:
+                    parts.append("</section>")
+                parts.append(f'<section path="{_escape_attr(path)}">')
+                current_path = path
+            parts.append(ET.tostring(case, encoding="unicode", with_tail=False))
+        parts.append(f"</section></{root.tag}>")
+        chunks.append("".join(parts))
+    return chunks
+
+
 class TestCaseGeneratorAgent:
     """LLM-powered agent that converts **TestRail XML** test cases into a structured JSON schema.
 
@@ -13,25 +116,44 @@ class TestCaseGeneratorAgent:
     All heavy lifting is off-loaded to the LLM; the class merely orchestrates IO.
     """
 
-    def __init__(self, xml_path: str, output_json_path: str, model: str = "gpt-4.1-mini"):
+    def __init__(
+        self,
+        xml_path: str,
+        output_json_path: str,
+        model: str = "gpt-4.1-mini",
+        client: OpenAI | None = None,
+        max_cases_per_chunk: int | None = None,
+        async_client: AsyncOpenAI | None = None,
+    ):
         """Instantiate the agent.
 
         Args:
             xml_path: Absolute or relative path to a TestRail **XML** export.
             output_json_path: Destination file where the generated JSON test cases will be written.
             model: OpenAI chat-completion model name. Defaults to the light-weight *gpt-4.1-mini*.
+            client: OpenAI client to use; defaults to the process-wide :func:`Agents.openai_client.shared_client`.
+            max_cases_per_chunk: If set, large exports are converted in chunks of this many ``<case>`` elements
+                in parallel (see :meth:`agenerate_chunked`) instead of in one request.
+            async_client: Async OpenAI client for the ``a*`` coroutines. Defaults to the per-event-loop
+                :func:`Agents.openai_client.shared_async_client`, configured like *client* if one is given.
+                It must only be used on one event loop.
         """
-        from dotenv import load_dotenv
-        from openai import OpenAI
-        import xml.etree.ElementTree as ET
-        load_dotenv(override=True)
-        self.openai = OpenAI()
+        self.openai = client or shared_client()
+        # The async pipeline mirrors an injected sync client's settings unless given its own client.
+        self._injected_client = client
+        self._async_client = async_client
         self.xml_path = xml_path
         self.output_json_path = output_json_path
         self.model = model
-        self.ET = ET
-        self.context_tc_xml_tree = None
+        self.max_cases_per_chunk = max_cases_per_chunk
         self.context_tc_xml = None
+        # Time-to-first-token of the last generation request in seconds (observability only).
+        self.first_token_latency: float | None = None
+
+    @property
+    def aopenai(self) -> AsyncOpenAI:
+        """Async client used by :meth:`arun`; bound to the running event loop unless one was passed in."""
+        return self._async_client or shared_async_client(self._injected_client)
 
     def load_json_to_dict(self, file_path: str):
         """Utility helper to load *any* JSON file into a Python ``dict``.
@@ -44,77 +166,487 @@ class TestCaseGeneratorAgent:
         Returns:
             The decoded Python dictionary or *None* if the file does not exist / is invalid JSON.
         """
-        import json
         try:
-            with open(file_path, 'r') as file:
-                return json.load(file)
+            return orjson.loads(Path(file_path).read_bytes())
         except FileNotFoundError:
-            print(f"File not found: {file_path}")
+            log.warning("File not found: %s", file_path)
             return None
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON: {e}")
+        except orjson.JSONDecodeError as e:
+            log.warning("Failed to parse JSON: %s", e)
             return None
 
     def parse_xml(self) -> None:
-        """Read the TestRail XML file from *xml_path* into :pyattr:`context_tc_xml`."""
-        self.context_tc_xml_tree = self.ET.parse(self.xml_path)
-        self.context_tc_xml = self.ET.tostring(self.context_tc_xml_tree.getroot(), encoding='unicode')
+        """Read the TestRail XML file from *xml_path* into :pyattr:`context_tc_xml`.
+
+        Parsing is done by libxml2 (via ``lxml``); comments, processing instructions and whitespace-only
+        text nodes carry nothing the LLM needs, so they are dropped to shrink the prompt. So are the
+        bookkeeping elements in :data:`_DROP_TAGS` and every attribute not listed in :data:`_KEEP_ATTRS`.
+
+        The document is streamed with ``iterparse`` and serialised element by element into one
+        :class:`io.StringIO`; finished elements are cleared straight away, so the full DOM is never held
+        in memory next to its serialised copy.
+        """
+        buf = io.StringIO()
+        opened: list[bool] = []  # per open element: whether its start tag has been closed with ">"
+        pending_tail = None  # element whose tail text follows next in document order
+        skip_depth = 0  # > 0 while inside a dropped element
+
+        def write_text(text: str | None) -> None:
+            if text and not text.isspace():
+                buf.write(escape(text))
+
+        def flush_pending() -> None:
+            nonlocal pending_tail
+            if pending_tail is not None:
+                write_text(pending_tail.tail)
+            pending_tail = None
+
+        for event, elem in ET.iterparse(
+            self.xml_path,
+            events=("start", "end"),
+            remove_comments=True,
+            remove_pis=True,
+            remove_blank_text=True,
+        ):
+            if event == "start":
+                if skip_depth:
+                    skip_depth += 1
+                    continue
+                if opened and not opened[-1]:
+                    # Close the parent's start tag and emit its leading text before any child content.
+                    buf.write(">")
+                    opened[-1] = True
+                    write_text(elem.getparent().text)
+                flush_pending()
+                if ET.QName(elem).localname in _DROP_TAGS:
+                    skip_depth = 1
+                    continue
+                buf.write(f"<{_tag_name(elem)}")
+                for name, value in elem.attrib.items():
+                    local_name = ET.QName(name).localname
+                    if local_name in _KEEP_ATTRS:
+                        buf.write(f' {local_name}="{_escape_attr(value)}"')
+                opened.append(False)
+                continue
+
+            if skip_depth:
+                skip_depth -= 1
+                if skip_depth:
+                    continue
+            else:
+                flush_pending()
+                if not opened[-1] and elem.text and not elem.text.isspace():
+                    buf.write(">")
+                    opened[-1] = True
+                    write_text(elem.text)
+                buf.write(f"</{_tag_name(elem)}>" if opened.pop() else "/>")
+            pending_tail = elem
+            # Free what has been written: this element's subtree and the siblings before it.
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+        self.context_tc_xml = buf.getvalue()
 
     def build_prompt(self) -> str:
-        """Construct the **single** prompt sent to the LLM.
+        """Construct the per-export *user* message: the XML payload.
 
-        The prompt contains both the *system* instructions and the raw XML payload. It purposefully ends with
-        the directive *"Response should be pure JSON"* so that the model does not wrap the output in Markdown
-        fences or informal prose.
+        Valid JSON output is enforced server-side through JSON mode (see :data:`_JSON_MODE`), not through
+        the prompt.
 
         Returns:
-            Fully-formed prompt string ready to be passed to :pyfunc:`openai.chat.completions.create`.
+            The user message content; see :meth:`build_messages` for the full conversation.
         """
-        prompt = """
-You are an experienced QA Engineer. Your job is to write test cases for API endpoints.
-You will receive an XML file (exported from testrail) that contains the test cases for an API endpoint.
-You will need to convert these XML cases into a uniform text format that can be used to automate the test cases.
-The test cases should be written in a way that is easy to understand and easy to automate. JSON format with meaningful key names.
-If there are additional test cases that are not covered by the XML file, you should add them to the test cases.
-Response Should be pure JSON, no other text, no markdown
-"""
-        prompt += f"TC_XML_FILE: {self.context_tc_xml}"
-        return prompt
+        return f"TC_XML_FILE: {self.context_tc_xml}"
+
+    def build_messages(self) -> list[dict]:
+        """Assemble the chat messages passed to :pyfunc:`openai.chat.completions.create`.
+
+        The instructions travel as a separate, byte-identical *system* message so that the provider's
+        automatic prompt cache can reuse that prefix across exports; only the XML differs per request.
+        """
+        return [
+            {"role": "system", "content": _INSTRUCTIONS},
+            {"role": "user", "content": self.build_prompt()},
+        ]
+
+    def _track_first_token(self) -> Callable[[], None]:
+        """Reset :pyattr:`first_token_latency` and return the ``on_first_token`` callback that sets it."""
+        started = time.perf_counter()
+        self.first_token_latency = None
+
+        def record_first_token() -> None:
+            self.first_token_latency = time.perf_counter() - started
+            log.info("First token received after %.2fs", self.first_token_latency)
+
+        return record_first_token
 
     def generate_test_cases(self):
         """Call the LLM and return the decoded JSON test cases.
 
+        The response is requested in JSON mode and streamed; the time until its first token is kept in
+        :pyattr:`first_token_latency`. Should it still not decode, the request is retried once with a fixed
+        seed – unless it was cut off at the token limit, which a retry would only hit again.
+
         Returns:
             A ``dict`` representing the JSON response or *None* if the response could not be parsed.
         """
-        import json
-        prompt = self.build_prompt()
-        response = self.openai.chat.completions.create(
+        messages = self.build_messages()
+        for retry_kwargs in ({}, {"seed": _RETRY_SEED}):
+            finish_reasons: list[str] = []
+            response_content = stream_completion(
+                self.openai,
+                on_first_token=self._track_first_token(),
+                on_finish=finish_reasons.append,
+                model=self.model,
+                messages=messages,
+                response_format=_JSON_MODE,
+                **retry_kwargs,
+            )
+            try:
+                return orjson.loads(response_content)
+            except orjson.JSONDecodeError as e:
+                log.warning("Response is not valid JSON: %s\nResponse content was:\n%s", e, response_content)
+            if "length" in finish_reasons:
+                log.warning("Response was cut off at the token limit – not retrying")
+                break
+        return None
+
+    async def agenerate_test_cases(self):
+        """Coroutine counterpart of :meth:`generate_test_cases` built on :class:`openai.AsyncOpenAI`."""
+        return await self._arequest_json(self.build_messages(), record_first_token=True)
+
+    def generate_test_cases_raw(self) -> bytes | None:
+        """Like :meth:`generate_test_cases`, but return the response as UTF-8 JSON bytes without decoding it.
+
+        JSON mode guarantees syntactically valid JSON for every response that ends with
+        ``finish_reason == "stop"``, so such a response is passed through untouched – no parse and no
+        re-serialisation of a potentially large document. Any other ending is first checked with
+        :func:`orjson.loads` on the content already received; if it does not decode, a response cut off at
+        the token limit is given up on (a retry would be cut off again) and anything else falls back to
+        the decoding path with its seeded retry.
+        """
+        finish_reasons: list[str] = []
+        response_content = stream_completion(
+            self.openai,
+            on_first_token=self._track_first_token(),
+            on_finish=finish_reasons.append,
             model=self.model,
-            messages=[{"role": "user", "content": prompt}]
+            messages=self.build_messages(),
+            response_format=_JSON_MODE,
         )
-        response_content = response.choices[0].message.content
-        try:
-            response_json = json.loads(response_content)
-            return response_json
-        except json.JSONDecodeError as e:
-            print(f"Response is not valid JSON: {e}\nResponse content was:\n{response_content}")
+        if finish_reasons == ["stop"]:
+            return response_content.encode("utf-8")
+        if self._salvage_unfinished(response_content, finish_reasons):
+            return response_content.encode("utf-8")
+        if "length" in finish_reasons:
             return None
 
+        test_cases = self.generate_test_cases()
+        return None if test_cases is None else orjson.dumps(test_cases, option=orjson.OPT_INDENT_2)
+
+    async def agenerate_test_cases_raw(self) -> bytes | None:
+        """Coroutine counterpart of :meth:`generate_test_cases_raw`."""
+        finish_reasons: list[str] = []
+        response_content = await astream_completion(
+            self.aopenai,
+            on_first_token=self._track_first_token(),
+            on_finish=finish_reasons.append,
+            model=self.model,
+            messages=self.build_messages(),
+            response_format=_JSON_MODE,
+        )
+        if finish_reasons == ["stop"]:
+            return response_content.encode("utf-8")
+        if self._salvage_unfinished(response_content, finish_reasons):
+            return response_content.encode("utf-8")
+        if "length" in finish_reasons:
+            return None
+
+        test_cases = await self.agenerate_test_cases()
+        return None if test_cases is None else orjson.dumps(test_cases, option=orjson.OPT_INDENT_2)
+
+    async def agenerate_chunked(self, max_cases_per_chunk: int = 20) -> dict | None:
+        """Convert the parsed export chunk by chunk, with all chunk requests in flight at once.
+
+        The ``<case>`` elements are split into chunks of at most *max_cases_per_chunk* (see
+        :func:`_case_chunks`), each chunk is converted by its own request and the resulting lists are
+        concatenated. The end-to-end time thus approaches that of the slowest chunk, and no single prompt
+        grows with the size of the export. Requires :meth:`parse_xml` to have run.
+
+        Returns:
+            ``{"test_cases": [...]}`` with the cases of all chunks in document order, or *None* if any chunk
+            failed (a partial suite would silently drop test cases).
+        """
+        chunks = _case_chunks(self.context_tc_xml, max_cases_per_chunk)
+        if not chunks:
+            log.info("No <case> elements found in %s – converting it in one request", self.xml_path)
+            return await self.agenerate_test_cases()
+
+        system = {"role": "system", "content": _INSTRUCTIONS + _CHUNK_INSTRUCTIONS}
+        results = await asyncio.gather(*(
+            self._arequest_json([system, {"role": "user", "content": f"TC_XML_FILE: {chunk}"}])
+            for chunk in chunks
+        ))
+
+        test_cases = []
+        for idx, result in enumerate(results):
+            if not isinstance(result, dict) or not isinstance(result.get("test_cases"), list):
+                log.warning("Chunk %d/%d of %s could not be converted", idx + 1, len(chunks), self.xml_path)
+                return None
+            test_cases.extend(result["test_cases"])
+        return {"test_cases": test_cases}
+
+    def generate_chunked(self, max_cases_per_chunk: int = 20) -> dict | None:
+        """Blocking wrapper around :meth:`agenerate_chunked`."""
+        return asyncio.run(self.agenerate_chunked(max_cases_per_chunk))
+
+    async def _arequest_json(self, messages: list[dict], record_first_token: bool = False):
+        """Stream one JSON-mode completion and decode it, retrying once with a fixed seed if that fails.
+
+        A response cut off at the token limit is not retried. With *record_first_token*, the time to the
+        first token is kept in :pyattr:`first_token_latency`.
+        """
+        for retry_kwargs in ({}, {"seed": _RETRY_SEED}):
+            finish_reasons: list[str] = []
+            response_content = await astream_completion(
+                self.aopenai,
+                on_first_token=self._track_first_token() if record_first_token else None,
+                on_finish=finish_reasons.append,
+                model=self.model,
+                messages=messages,
+                response_format=_JSON_MODE,
+                **retry_kwargs,
+            )
+            try:
+                return orjson.loads(response_content)
+            except orjson.JSONDecodeError as e:
+                log.warning("Response is not valid JSON: %s\nResponse content was:\n%s", e, response_content)
+            if "length" in finish_reasons:
+                log.warning("Response was cut off at the token limit – not retrying")
+                break
+        return None
+
+    @staticmethod
+    def _salvage_unfinished(response_content: str, finish_reasons: list[str]) -> bool:
+        """Tell whether a response that did not end with ``"stop"`` still holds valid JSON, logging the outcome."""
+        try:
+            orjson.loads(response_content)
+        except orjson.JSONDecodeError:
+            if "length" in finish_reasons:
+                log.warning("Response was cut off at the token limit (finish_reason=%s) – not retrying", finish_reasons)
+            else:
+                log.warning("Response ended with finish_reason=%s – retrying with JSON validation", finish_reasons)
+            return False
+        log.warning("Response ended with finish_reason=%s but holds valid JSON – keeping it", finish_reasons)
+        return True
+
     def save_test_cases(self, test_cases: dict) -> None:
         """Persist *test_cases* to :pyattr:`output_json_path` on disk.
 
         Args:
             test_cases: The JSON-serialisable test case dictionary returned by the LLM.
         """
-        import json
-        with open(self.output_json_path, "w") as outfile:
-            json.dump(test_cases, outfile, indent=2)
-        print(f"JSON written to {self.output_json_path}")
+        self.save_test_cases_raw(orjson.dumps(test_cases, option=orjson.OPT_INDENT_2))
+
+    def save_test_cases_raw(self, content: bytes) -> None:
+        """Write already serialised JSON *content* to :pyattr:`output_json_path` as is."""
+        with open(self.output_json_path, "wb") as outfile:
+            outfile.write(content)
+        log.info("JSON written to %s", self.output_json_path)
+
+    def _cache_path(self) -> Path:
+        """Location of the cached LLM response for the current input.
+
+        The key is the SHA-256 of the XML bytes, the model, the instructions and the chunk size, so any
+        change to one of them is a cache miss. Entries live in ``.cache/`` next to :pyattr:`output_json_path`.
+        """
+        digest = hashlib.sha256(Path(self.xml_path).read_bytes())
+        digest.update(self.model.encode("utf-8"))
+        digest.update(_INSTRUCTIONS.encode("utf-8"))
+        if self.max_cases_per_chunk:
+            digest.update(f"chunked:{self.max_cases_per_chunk}".encode("utf-8"))
+        return Path(self.output_json_path).parent / ".cache" / f"{digest.hexdigest()}.json"
+
+    def _load_cached(self, cache_path: Path) -> bytes | None:
+        """Return the serialised test cases cached at *cache_path*, or *None* on a miss."""
+        try:
+            content = cache_path.read_bytes()
+        except OSError:
+            return None
+        log.info("XML unchanged – reusing cached test cases from %s", cache_path)
+        return content
+
+    def _store_cached(self, cache_path: Path, content: bytes) -> None:
+        """Cache the serialised test cases *content* at *cache_path*. Failures only cost the cache, never the run."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_bytes(content)
+        except OSError:
+            pass
+
+    @staticmethod
+    def generate_batch(agents: list[TestCaseGeneratorAgent], poll_interval: float = 30.0) -> list[dict | None]:
+        """Convert many XML exports through a single OpenAI Batch API job and save each result.
+
+        Cheaper (about half the price) than calling :meth:`run` per agent and not bound by the per-minute
+        request limit, but results are only available once the whole batch job has completed.
+
+        Args:
+            agents: Generator agents whose XML exports should be converted; the first agent's client submits the job.
+            poll_interval: Seconds to wait between two status checks of the batch job.
+
+        Returns:
+            The decoded test cases per agent (same order as *agents*), or *None* where the request failed.
+        """
+
+        if not agents:
+            return []
+
+        bodies = {}
+        for idx, agent in enumerate(agents):
+            agent.parse_xml()
+            bodies[str(idx)] = {
+                "model": agent.model,
+                "messages": agent.build_messages(),
+                "response_format": _JSON_MODE,
+            }
+
+        results = run_chat_batch(agents[0].openai, bodies, poll_interval=poll_interval)
+
+        all_test_cases = []
+        for idx, agent in enumerate(agents):
+            response_content = results[str(idx)]
+            test_cases = None
+            if response_content is None:
+                log.warning("Batch request for %s failed", agent.xml_path)
+            else:
+                try:
+                    test_cases = orjson.loads(response_content)
+                except orjson.JSONDecodeError as e:
+                    log.warning("Response is not valid JSON: %s\nResponse content was:\n%s", e, response_content)
+            if test_cases is not None:
+                agent.save_test_cases(test_cases)
+            all_test_cases.append(test_cases)
+        return all_test_cases
+
+    @staticmethod
+    def generate_combined(agents: list[TestCaseGeneratorAgent]) -> list[dict | None]:
+        """Convert several XML exports with a **single** chat-completion request and save each result.
+
+        The exports are sent as ``<FILE id=N>`` sections after one copy of the instructions and the model
+        answers with a JSON object keyed by those ids, so the per-request overhead and the instruction
+        tokens are paid once. Exports found in the on-disk cache are not sent at all. Best suited to a
+        handful of small suites; use :meth:`generate_batch` for bulk runs whose answers would exceed the
+        model's output limit.
+
+        Args:
+            agents: Generator agents whose XML exports should be converted; the first agent's client and model are used.
+
+        Returns:
+            The decoded test cases per agent (same order as *agents*), or *None* where conversion failed.
+        """
+
+        if not agents:
+            return []
+
+        all_test_cases: list[dict | None] = []
+        cache_paths = []
+        sections = []
+        for idx, agent in enumerate(agents):
+            cache_path = agent._cache_path()
+            cache_paths.append(cache_path)
+            cached = agent._load_cached(cache_path)
+            all_test_cases.append(None if cached is None else orjson.loads(cached))
+            if all_test_cases[idx] is None:
+                agent.parse_xml()
+                sections.append(f"<FILE id={idx}>{agent.context_tc_xml}</FILE>")
+
+        if sections:
+            response_content = stream_completion(
+                agents[0].openai,
+                model=agents[0].model,
+                messages=[
+                    {"role": "system", "content": _INSTRUCTIONS + _COMBINED_INSTRUCTIONS},
+                    {"role": "user", "content": "\n".join(sections)},
+                ],
+                response_format=_JSON_MODE,
+            )
+            try:
+                response_json = orjson.loads(response_content)
+            except orjson.JSONDecodeError as e:
+                log.warning("Response is not valid JSON: %s\nResponse content was:\n%s", e, response_content)
+                response_json = {}
+            if not isinstance(response_json, dict):
+                response_json = {}
+
+            for idx, agent in enumerate(agents):
+                if all_test_cases[idx] is not None:
+                    continue
+                test_cases = response_json.get(str(idx))
+                if test_cases is None:
+                    log.warning("Combined response has no test cases for %s", agent.xml_path)
+                    continue
+                agent._store_cached(cache_paths[idx], orjson.dumps(test_cases))
+                all_test_cases[idx] = test_cases
+
+        for agent, test_cases in zip(agents, all_test_cases):
+            if test_cases is not None:
+                agent.save_test_cases(test_cases)
+        return all_test_cases
 
     def run(self) -> None:
-        """Execute the full agent workflow (parse → generate → save)."""
-        self.parse_xml()
-        test_cases = self.generate_test_cases()
-        if test_cases is not None:
-            self.save_test_cases(test_cases)
+        """Execute the full agent workflow (parse → generate → save).
+
+        Parsing and generation are skipped entirely when the same XML was already converted with the same
+        model (see :meth:`_cache_path`). Nothing downstream needs the decoded test cases – the coder reads
+        the file – so the response is written as returned (see :meth:`generate_test_cases_raw`).
+        """
+        cache_path = self._cache_path()
+        content = self._load_cached(cache_path)
+        if content is None:
+            self.parse_xml()
+            if self.max_cases_per_chunk:
+                test_cases = self.generate_chunked(self.max_cases_per_chunk)
+                content = None if test_cases is None else orjson.dumps(test_cases, option=orjson.OPT_INDENT_2)
+            else:
+                content = self.generate_test_cases_raw()
+            if content is not None:
+                self._store_cached(cache_path, content)
+        if content is not None:
+            self.save_test_cases_raw(content)
+
+    async def arun(self) -> None:
+        """Coroutine counterpart of :meth:`run`.
+
+        The XML is parsed in a worker thread while a one-token ping warms the connection and the model
+        (:func:`Agents.openai_client.awarm_up`), so the TLS handshake and the model's cold start are hidden
+        behind the parse instead of delaying the generation request.
+        """
+        cache_path = self._cache_path()
+        content = self._load_cached(cache_path)
+        if content is None:
+            # Agents converting the same input on this loop (e.g. concurrent orchestrators) share one request.
+            key = (asyncio.get_running_loop(), cache_path.name)
+            task = _inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._agenerate_content(cache_path))
+                _inflight[key] = task
+                task.add_done_callback(lambda _: _inflight.pop(key, None))
+            else:
+                log.info("Same XML is already being converted – waiting for that request (%s)", self.xml_path)
+            content = await asyncio.shield(task)
+        if content is not None:
+            self.save_test_cases_raw(content)
+
+    async def _agenerate_content(self, cache_path: Path) -> bytes | None:
+        """Parse, convert and cache the export; the shared body of :meth:`arun`."""
+        await asyncio.gather(asyncio.to_thread(self.parse_xml), awarm_up(self.aopenai, self.model))
+        if self.max_cases_per_chunk:
+            test_cases = await self.agenerate_chunked(self.max_cases_per_chunk)
+            content = None if test_cases is None else orjson.dumps(test_cases, option=orjson.OPT_INDENT_2)
+        else:
+            content = await self.agenerate_test_cases_raw()
+        if content is not None:
+            self._store_cached(cache_path, content)
+        return content
@@ -0,0 +1,23 @@
+"""Filesystem helpers shared by the orchestrator and the agents."""
+
+from __future__ import annotations
+
+import functools
+import os
+from pathlib import Path
+
+
+def ensure_dir(path: str | Path) -> None:
+    """Create *path* (and its parents) once per process.
+
+    The cache is keyed on :func:`os.path.abspath` – string work plus one ``getcwd`` – so relative and
+    absolute spellings of one directory share an entry without the ``stat`` calls of ``Path.resolve()``;
+    a repeated call thus costs less than the ``mkdir(exist_ok=True)`` it replaces. A directory removed
+    while the process runs is not recreated – acceptable for the artefact folders.
+    """
+    _ensure_abs_dir(os.path.abspath(path))
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_abs_dir(path: str) -> None:
+    Path(path).mkdir(exist_ok=True, parents=True)
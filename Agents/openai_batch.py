@@ -0,0 +1,64 @@
+"""Thin helper around the OpenAI **Batch API** used by the agents' ``generate_batch`` helpers.
+
+Submitting many chat completions as a single batch job costs roughly half as much as issuing them one by
+one and is not subject to the per-minute request limit, which makes it the preferred path when
+regenerating a large tree of TestRail exports in CI. The trade-off is latency: results arrive within the
+*completion window* rather than immediately.
+"""
+
+from __future__ import annotations
+
+import time
+
+import orjson
+from openai import OpenAI
+
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def run_chat_batch(client: OpenAI, bodies: dict[str, dict], poll_interval: float = 30.0) -> dict[str, str | None]:
+    """Run every chat-completion request in *bodies* as one batch job and wait for the results.
+
+    Args:
+        client: OpenAI client used for the upload, the job and the result download.
+        bodies: Mapping of ``custom_id`` → ``/v1/chat/completions`` request body.
+        poll_interval: Seconds to sleep between two status checks of the batch job.
+
+    Returns:
+        Mapping of ``custom_id`` → assistant message content, or *None* for requests that failed.
+
+    Raises:
+        RuntimeError: If the batch job itself does not complete.
+    """
+    lines = [
+        orjson.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+        for custom_id, body in bodies.items()
+    ]
+    input_file = client.files.create(
+        file=("requests.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    while batch.status not in _TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} finished with status '{batch.status}'")
+
+    results: dict[str, str | None] = dict.fromkeys(bodies)
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                continue
+            results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
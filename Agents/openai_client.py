@@ -0,0 +1,154 @@
+"""Helpers shared by the agents for talking to the OpenAI chat-completion API."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import weakref
+from collections.abc import Callable
+
+import httpx
+import openai
+import tenacity
+from dotenv import load_dotenv  # noqa: WPS433 – runtime import before openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+# Connection-pool sizing shared by the sync and async clients. Keep-alive connections let consecutive
+# calls (TC generation, coding, review cycles) reuse one TLS session instead of re-handshaking.
+_POOL_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+# Transient provider failures (rate limits, dropped connections/timeouts, 5xx) on top of the SDK's own
+# two quick retries: back off exponentially with jitter so that a blip does not fail the whole pipeline.
+_retry_transient = tenacity.retry(
+    retry=tenacity.retry_if_exception_type(
+        (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+    ),
+    wait=tenacity.wait_exponential_jitter(initial=1, max=30),
+    stop=tenacity.stop_after_attempt(5),
+    reraise=True,
+)
+
+# Async clients per event loop, keyed by the sync client whose settings they mirror (None: the default client).
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[OpenAI | None, AsyncOpenAI]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@functools.lru_cache(maxsize=1)
+def shared_client() -> OpenAI:
+    """Return the process-wide :class:`openai.OpenAI` client used by every agent.
+
+    The ``.env`` file is loaded on first use so that ``OPENAI_API_KEY`` is picked up from the user
+    environment; the client speaks HTTP/2 over a pooled, keep-alive :class:`httpx.Client`.
+    """
+    load_dotenv(override=True)
+    return OpenAI(http_client=DefaultHttpxClient(http2=True, limits=_POOL_LIMITS))
+
+
+def shared_async_client(like: OpenAI | None = None) -> AsyncOpenAI:
+    """Return the :class:`openai.AsyncOpenAI` client bound to the running event loop.
+
+    An ``httpx.AsyncClient`` pool cannot outlive the loop it was first used on, so one client is kept
+    per loop (and dropped with it). Must be called from within a coroutine.
+
+    Args:
+        like: A caller-supplied sync client whose credentials and endpoint (API key, organisation, project,
+            base URL, timeout and retries) the async client should use instead of the environment defaults.
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(like)
+    if client is None:
+        http_client = DefaultAsyncHttpxClient(http2=True, limits=_POOL_LIMITS)
+        if like is None:
+            load_dotenv(override=True)
+            client = AsyncOpenAI(http_client=http_client)
+        else:
+            client = AsyncOpenAI(
+                api_key=like.api_key,
+                organization=like.organization,
+                project=like.project,
+                base_url=like.base_url,
+                timeout=like.timeout,
+                max_retries=like.max_retries,
+                http_client=http_client,
+            )
+        clients[like] = client
+    return client
+
+
+async def awarm_up(client: AsyncOpenAI, model: str) -> None:
+    """Warm the connection of *client* and the provider-side *model* ahead of the first real request.
+
+    A one-token "ping" completion pays the DNS/TCP/TLS set-up and the model's cold-start routing while the
+    caller does local work (e.g. parsing the XML export). Best effort: any error is swallowed, the
+    following request simply connects on its own.
+    """
+    try:
+        await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": "ping"}],
+            max_tokens=1,
+        )
+    except Exception:  # noqa: WPS429 – warm-up must never break the pipeline
+        pass
+
+
+@_retry_transient
+def stream_completion(
+    client: OpenAI,
+    on_first_token: Callable[[], None] | None = None,
+    on_finish: Callable[[str], None] | None = None,
+    **kwargs,
+) -> str:
+    """Run a chat completion with ``stream=True`` and return the assembled assistant message.
+
+    The deltas are collected as they arrive and joined once at the end, so the response text is never
+    copied more than once and no intermediate completion object is kept around. Transient failures
+    (rate limits, connection errors, 5xx) restart the request with exponential backoff, up to five attempts.
+    The stream is closed on the way out, so abandoning it (an exception, or cancelling the awaiting task in
+    the async variant) also aborts the response on the provider side.
+
+    Args:
+        client: OpenAI client used for the request.
+        on_first_token: Called once, as soon as the first non-empty content delta arrives (TTFT hook).
+        on_finish: Called with the ``finish_reason`` (e.g. ``"stop"`` or ``"length"``) once the stream reports it.
+        **kwargs: Forwarded verbatim to :pyfunc:`openai.chat.completions.create`.
+    """
+    parts: list[str] = []
+    with client.chat.completions.create(stream=True, **kwargs) as stream:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                if on_first_token is not None:
+                    on_first_token()
+                    on_first_token = None
+                parts.append(choice.delta.content)
+            if choice.finish_reason and on_finish is not None:
+                on_finish(choice.finish_reason)
+    return "".join(parts)
+
+
+@_retry_transient
+async def astream_completion(
+    client: AsyncOpenAI,
+    on_first_token: Callable[[], None] | None = None,
+    on_finish: Callable[[str], None] | None = None,
+    **kwargs,
+) -> str:
+    """Coroutine counterpart of :func:`stream_completion`."""
+    parts: list[str] = []
+    async with await client.chat.completions.create(stream=True, **kwargs) as stream:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                if on_first_token is not None:
+                    on_first_token()
+                    on_first_token = None
+                parts.append(choice.delta.content)
+            if choice.finish_reason and on_finish is not None:
+                on_finish(choice.finish_reason)
+    return "".join(parts)
@@ -0,0 +1,296 @@
+"""Shared loader for the `context_playwright/` helper files injected into the agents' prompts.
+
+Both the :class:`Agents.CODER_AGENT.CoderAgentShell` and the
+:class:`Agents.CODE_REVIEWER_AGENT.CodeReviewerAgent` embed the same selection of helper files so that
+the LLM can mimic (respectively judge) the style of the existing suite. Keeping the walk in one place
+lets both agents share a single in-process cache, which is in turn backed by a manifest-validated copy
+of the blob under ``~/.cache/qa_autoautomation/`` so that later runs skip reading the files as well.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import io
+import os
+import re
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import orjson
+
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# ------------------------------------------------------------------
+# Locations of the Playwright project context directory.
+# The folder may live directly under the project root *or* inside a
+# nested `context/` folder depending on how the repository is laid out.
+# The first path that exists wins, to remain backwards compatible with
+# both structures.
+# ------------------------------------------------------------------
+_CANDIDATE_CONTEXT_DIRS = (
+    _PROJECT_ROOT / "context_playwright",
+    _PROJECT_ROOT / "context" / "context_playwright",
+)
+
+# --------------------------------------------------------------
+# Selectively import only *key* Playwright helper files to keep the
+# prompt size manageable. We purposefully exclude entire test suites
+# or heavyweight files that do not aid code generation.
+# --------------------------------------------------------------
+_ALLOWED_BASE_DIRS = frozenset({"utils", "globals", "locators"})
+_ALWAYS_INCLUDE_FILES = frozenset({"playwright.config.js"})
+# Never descended into, even below an allowed folder.
+_EXCLUDED_DIRS = frozenset({"node_modules", ".git", "test-results", "playwright-report"})
+
+# Bump whenever the blob format (selection, minification, layout) changes to invalidate on-disk caches.
+_CACHE_VERSION = 2
+
+_JS_SUFFIXES = {".js", ".mjs", ".cjs", ".ts"}
+
+# String literals are matched first so that comment markers inside them (e.g. "https://…") survive;
+# only the comment alternative is dropped by :func:`_minify_js`.
+_JS_STRING_OR_COMMENT_RE = re.compile(
+    r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)|/\*.*?\*/|//[^\n]*""",
+    re.DOTALL,
+)
+_BLANK_LINES_RE = re.compile(r"\n(?:[ \t]*\n)+")
+
+# Shared leading lines shorter than this are not worth a separate COMMON_HEADER block.
+_MIN_HEADER_CHARS = 40
+
+
+def _walk(directory: str) -> Iterator[os.DirEntry]:
+    """Recursively yield an entry for every file below *directory*.
+
+    Built on :func:`os.scandir`, whose entries carry the file type from the directory listing, so no
+    extra ``stat`` is needed to tell files from folders. Symlinked directories are not followed and
+    :data:`_EXCLUDED_DIRS` are pruned without being listed.
+    """
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in _EXCLUDED_DIRS:
+                    yield from _walk(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+def _select_files(root: Path) -> list[tuple[Path, os.stat_result]]:
+    """Return the helper files below *root* that belong in the prompt, with their ``stat`` results.
+
+    Only the allowed top-level folders are descended into, so unrelated trees (test suites, a stray
+    ``node_modules``) are never even listed.
+    """
+    candidates: list[os.DirEntry] = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in _ALLOWED_BASE_DIRS:  # e.g. utils/..., globals/...
+                    candidates.extend(_walk(entry.path))
+            elif entry.name in _ALWAYS_INCLUDE_FILES and entry.is_file():
+                candidates.append(entry)
+
+    selected: list[tuple[Path, os.stat_result]] = []
+    for entry in candidates:
+        # Additionally filter by file size to avoid extremely large files (>30 KB)
+        st = entry.stat()
+        if st.st_size >= 30_000:
+            continue
+
+        selected.append((Path(entry.path), st))
+    return selected
+
+
+@functools.lru_cache(maxsize=8)
+def _load_context_blob(context_dir: str, fingerprint: tuple[tuple[str, int, int], ...]) -> str:
+    """Return the prompt blob for the files described by *fingerprint* (``(rel_path, size, mtime_ns)`` each).
+
+    Memoised in-process on ``(context_dir, fingerprint)``, so repeated prompt builds during the reviewer
+    feedback loop cost a single ``stat`` walk. Across processes the blob is reused from the on-disk cache
+    (see :func:`_cache_dir_for`) when the stored manifest matches – either on the ``stat`` fields alone,
+    or, after a mere ``touch``, on the content digests.
+    """
+    if not fingerprint:
+        return ""
+
+    cache_dir = _cache_dir_for(context_dir)
+    manifest = _read_manifest(cache_dir)
+    if manifest is not None and [
+        (entry["path"], entry["size"], entry["mtime_ns"]) for entry in manifest["files"]
+    ] == list(fingerprint):
+        cached_blob = _read_cached_blob(cache_dir)
+        if cached_blob is not None:
+            return cached_blob
+
+    root = Path(context_dir)
+    selected = [(root / rel_path, size) for rel_path, size, _ in fingerprint]
+
+    # The reads release the GIL, so a small pool overlaps their latency instead of paying it serially.
+    with ThreadPoolExecutor(max_workers=min(16, len(selected))) as executor:
+        contents = list(executor.map(_read_one, selected))
+    digests = [hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest() for content in contents]
+
+    blob = None
+    if manifest is not None and [
+        (entry["path"], entry["blake2b"]) for entry in manifest["files"]
+    ] == [(rel_path, digest) for (rel_path, _, _), digest in zip(fingerprint, digests)]:
+        blob = _read_cached_blob(cache_dir)
+    if blob is None:
+        blob = _assemble_blob(selected, contents)
+
+    _write_cache(cache_dir, fingerprint, digests, blob)
+    return blob
+
+
+def _assemble_blob(selected: list[tuple[Path, int]], contents: list[str]) -> str:
+    """Minify, deduplicate and concatenate the helper *contents* into the prompt blob."""
+    contents = [
+        _minify_js(file_content) if file_path.suffix in _JS_SUFFIXES else file_content
+        for (file_path, _), file_content in zip(selected, contents)
+    ]
+
+    # --------------------------------------------------------------
+    # Emit every header that several files start with only once, as a
+    # numbered COMMON_HEADER block, and reference it from those files.
+    # --------------------------------------------------------------
+    headers = _common_headers(contents)
+    common_headers = {header: idx for idx, header in enumerate(dict.fromkeys(h for h in headers if h))}
+
+    # Write every block straight into one buffer instead of formatting per-file strings and joining them.
+    buf = io.StringIO()
+    separator = ""
+    for header, idx in common_headers.items():
+        buf.write(separator)
+        buf.write(f"COMMON_HEADER {idx}:\n")
+        buf.write(header)
+        separator = "\n\n"
+    for (file_path, _), file_content, header in zip(selected, contents, headers):
+        buf.write(separator)
+        buf.write("FILE: ")
+        buf.write(file_path.name)
+        if header in common_headers:
+            buf.write(f" (starts with COMMON_HEADER {common_headers[header]})\\n")
+            buf.write(file_content[len(header):])
+        else:
+            buf.write("\\n")
+            buf.write(file_content)
+        separator = "\n\n"
+    return buf.getvalue()
+
+
+def _minify_js(source: str) -> str:
+    """Strip comments and collapse runs of blank lines in JavaScript/TypeScript *source*.
+
+    Best effort, prompt-only transformation: string and template literals are preserved, but the output is
+    never executed, so the rare regex literal containing ``//`` being mangled is an accepted trade-off.
+    """
+    source = _JS_STRING_OR_COMMENT_RE.sub(lambda m: m.group(1) or "", source)
+    return _BLANK_LINES_RE.sub("\n", source).strip() + "\n"
+
+
+def _common_headers(contents: list[str]) -> list[str]:
+    """Return, per file, the leading lines it shares with every other file opening with the same line.
+
+    Files are grouped by their first line; within a group of two or more, the longest run of identical
+    leading lines (e.g. a licence banner or a block of imports) is that group's header. ``""`` means the
+    file has no header worth deduplicating.
+    """
+    groups: defaultdict[str, list[int]] = defaultdict(list)
+    for idx, content in enumerate(contents):
+        first_line = content.split("\n", 1)[0]
+        if first_line.strip():
+            groups[first_line].append(idx)
+
+    headers = [""] * len(contents)
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        shared: list[str] = []
+        for lines in zip(*(contents[idx].splitlines(keepends=True) for idx in indices)):
+            if any(line != lines[0] for line in lines):
+                break
+            shared.append(lines[0])
+        header = "".join(shared)
+        if len(header) >= _MIN_HEADER_CHARS:
+            for idx in indices:
+                headers[idx] = header
+    return headers
+
+
+def _read_one(entry: tuple[Path, int]) -> str:
+    """Read a single ``(path, size)`` entry with one sized ``read`` syscall and decode it once."""
+    file_path, size = entry
+    try:
+        fd = os.open(str(file_path), os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        try:
+            data = os.read(fd, size)
+        finally:
+            os.close(fd)
+    except Exception:
+        # Any unreadable file is skipped to avoid breaking the prompt
+        return ""
+    return data.decode("utf-8", "ignore")
+
+
+def _cache_dir_for(context_dir: str) -> Path:
+    """On-disk cache location for *context_dir*: ``$XDG_CACHE_HOME/qa_autoautomation/<path hash>/``."""
+    cache_root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "qa_autoautomation"
+    return cache_root / hashlib.blake2b(context_dir.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _read_manifest(cache_dir: Path) -> dict | None:
+    """Load ``manifest.json`` from *cache_dir*; *None* if it is missing, unreadable or from another format."""
+    try:
+        manifest = orjson.loads((cache_dir / "manifest.json").read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != _CACHE_VERSION:
+        return None
+    return manifest
+
+
+def _read_cached_blob(cache_dir: Path) -> str | None:
+    """Load the cached ``blob.txt`` from *cache_dir*, or *None* if it cannot be read."""
+    try:
+        return (cache_dir / "blob.txt").read_bytes().decode("utf-8")
+    except OSError:
+        return None
+
+
+def _write_cache(
+    cache_dir: Path, fingerprint: tuple[tuple[str, int, int], ...], digests: list[str], blob: str
+) -> None:
+    """Persist *blob* and its manifest side by side. Failures only cost the cache, never the prompt."""
+    manifest = {
+        "version": _CACHE_VERSION,
+        "files": [
+            {"path": rel_path, "size": size, "mtime_ns": mtime_ns, "blake2b": digest}
+            for (rel_path, size, mtime_ns), digest in zip(fingerprint, digests)
+        ],
+    }
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Blob first, manifest last (both via atomic rename), so a manifest never points at a stale blob.
+        for name, data in (("blob.txt", blob.encode("utf-8")), ("manifest.json", orjson.dumps(manifest))):
+            tmp_path = cache_dir / f"{name}.{os.getpid()}.tmp"
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, cache_dir / name)
+    except OSError:
+        pass
+
+
+def load_context_blob() -> str:
+    """Return the helper-file blob for the project's Playwright context directory ("" if there is none)."""
+    context_dir = next((d for d in _CANDIDATE_CONTEXT_DIRS if d.exists()), None)
+    if context_dir is None:  # pragma: no cover – defensive, should usually exist
+        return ""
+
+    # Only ``stat`` fields feed the cache key, so an unchanged tree costs no file reads at all.
+    fingerprint = tuple(
+        (file_path.relative_to(context_dir).as_posix(), st.st_size, st.st_mtime_ns)
+        for file_path, st in _select_files(context_dir)
+    )
+    return _load_context_blob(str(context_dir), fingerprint)
@@ -1,83 +1,181 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from collections.abc import Sequence
 from pathlib import Path
 
+import orjson
+from openai import AsyncOpenAI, OpenAI
+
+from Agents.fs_utils import ensure_dir
 from Agents.TC_GENERATOR_AGENT.test_writer_main import TestCaseGeneratorAgent
 from Agents.CODER_AGENT.test_automator_main import CoderAgentShell
 from Agents.CODE_REVIEWER_AGENT.test_reviewer_main import CodeReviewerAgent
 import argparse
 
+log = logging.getLogger(__name__)
+
 
 class Orchestrator:
     """High-level controller that wires the individual agents together into a feedback loop."""
 
     def __init__(
         self,
-        xml_path: str | Path,
+        xml_paths: str | Path | Sequence[str | Path],
         work_dir: str | Path = "artifacts",
         model: str = "gpt-4o-mini",
         max_review_cycles: int = 3,
+        shard_index: int | None = None,
+        shard_total: int | None = None,
+        use_batch_api: bool = False,
+        max_cases_per_chunk: int | None = None,
+        client: OpenAI | None = None,
+        async_client: AsyncOpenAI | None = None,
     ) -> None:
         """Create a new orchestrator instance.
 
         Args:
-            xml_path: Path to the **TestRail XML** export that acts as the single source of truth for the tests.
+            xml_paths: Path(s) to the **TestRail XML** export(s) that act as the single source of truth for the tests.
+                Several exports are converted together and merged into one test-case JSON keyed by file name.
             work_dir: Directory where *all* intermediate artefacts (JSON, generated code, runtime logs) will be stored.
             model: OpenAI model ID passed on to the individual agents. Allows you to override it from the CLI.
             max_review_cycles: Safety valve – if the Reviewer agent still fails after *n* feedback loops, the run aborts.
+            shard_index: 1-based Playwright shard this machine runs when the suite is distributed (needs *shard_total*).
+            shard_total: Total number of Playwright shards.
+            use_batch_api: Convert several exports through the OpenAI Batch API (half the price, but results
+                may take up to 24h) instead of one combined chat-completion request.
+            max_cases_per_chunk: Convert a single large export in parallel chunks of this many test cases.
+                Only supported with one export; several exports are always converted whole.
+            client: OpenAI client shared by all agents; defaults to :func:`Agents.openai_client.shared_client`.
+            async_client: Async OpenAI client shared by all agents for :meth:`arun`; defaults to the client
+                bound to the running event loop, configured like *client* if one is given. Only use it with
+                a single :meth:`run` / :meth:`arun` call.
         """
-        self.xml_path = Path(xml_path)
+        if isinstance(xml_paths, (str, Path)):
+            xml_paths = [xml_paths]
+        self.xml_paths = [Path(xml_path) for xml_path in xml_paths]
+        if max_cases_per_chunk and len(self.xml_paths) > 1:
+            raise ValueError("max_cases_per_chunk only applies to a single XML export")
+        self.use_batch_api = use_batch_api
         self.work_dir = Path(work_dir)
-        self.work_dir.mkdir(exist_ok=True, parents=True)
+        ensure_dir(self.work_dir)
         self.model = model
         self.max_review_cycles = max_review_cycles
 
         # Derived paths
         self.json_path = self.work_dir / "generated_test_cases.json"
         self.code_dir = self.work_dir / "generated_tests"
-        self.code_dir.mkdir(exist_ok=True)
+        ensure_dir(self.code_dir)
 
-        # Agents
-        self.tc_generator = TestCaseGeneratorAgent(
-            xml_path=str(self.xml_path),
-            output_json_path=str(self.json_path),
-            model=self.model,
-        )
+        # Agents – all share one pooled HTTP/2 client so TLS sessions are reused from step to step
+        if len(self.xml_paths) == 1:
+            json_paths = [self.json_path]
+        else:
+            json_paths = [self.work_dir / "test_cases" / f"{xml_path.stem}.json" for xml_path in self.xml_paths]
+            ensure_dir(json_paths[0].parent)
+        self.tc_generators = [
+            TestCaseGeneratorAgent(
+                xml_path=str(xml_path),
+                output_json_path=str(json_path),
+                model=self.model,
+                client=client,
+                max_cases_per_chunk=max_cases_per_chunk,
+                async_client=async_client,
+            )
+            for xml_path, json_path in zip(self.xml_paths, json_paths)
+        ]
         self.coder = CoderAgentShell(
             test_case_json_path=str(self.json_path),
             output_dir=str(self.code_dir),
             model=self.model,
+            client=client,
+            async_client=async_client,
         )
         self.reviewer = CodeReviewerAgent(
             test_file_path=self.code_dir / "test_generated.spec.js",
             model=self.model,
+            shard_index=shard_index,
+            shard_total=shard_total,
+            client=client,
+            async_client=async_client,
         )
 
+    def _generate_merged_test_cases(self) -> bool:
+        """Convert all XML exports in one go and merge the results into :pyattr:`json_path`.
+
+        Returns:
+            *False* (and writes nothing) if not a single export could be converted.
+        """
+        if self.use_batch_api:
+            results = TestCaseGeneratorAgent.generate_batch(self.tc_generators)
+        else:
+            results = TestCaseGeneratorAgent.generate_combined(self.tc_generators)
+
+        merged: dict[str, dict] = {}
+        for xml_path, test_cases in zip(self.xml_paths, results):
+            if test_cases is None:
+                log.warning("[Orchestrator] ⚠️ No test cases generated for %s – skipping it.", xml_path)
+                continue
+            key = xml_path.stem if xml_path.stem not in merged else str(xml_path)
+            merged[key] = test_cases
+        if not merged:
+            log.error("[Orchestrator] 🚨 No test cases generated for any of the %d XML file(s).", len(self.xml_paths))
+            return False
+        self.json_path.write_bytes(orjson.dumps(merged, option=orjson.OPT_INDENT_2))
+        log.info("[Orchestrator] Merged test cases of %d XML file(s) into %s", len(merged), self.json_path)
+        return True
+
     def run(self) -> None:
-        """Execute the full agent pipeline."""
-        print("[Orchestrator] Generating test cases from XML …")
-        self.tc_generator.run()
+        """Execute the full agent pipeline (blocking wrapper around :meth:`arun`)."""
+        asyncio.run(self.arun())
 
-        print("[Orchestrator] Generating test code from JSON …")
-        self.coder.run()
+    async def arun(self) -> None:
+        """Execute the full agent pipeline on one event loop.
 
+        The TC → Coder → Reviewer chain is inherently sequential, but independent work is overlapped:
+        the XML parse runs alongside the OpenAI connection warm-up.
+        """
+        log.info("[Orchestrator] Generating test cases from XML …")
+        if len(self.tc_generators) == 1:
+            await self.tc_generators[0].arun()
+        elif not await asyncio.to_thread(self._generate_merged_test_cases):
+            log.error("[Orchestrator] 🛑 Nothing to automate – stopping before the coder step.")
+            return
+
+        log.info("[Orchestrator] Generating test code from JSON …")
+        await self.coder.arun()
+
+        # Digests of every version that has been reviewed, to spot a coder oscillating between versions.
+        reviewed_digests = {self.coder.code_digest}
         for cycle in range(1, self.max_review_cycles + 1):
-            print(f"[Orchestrator] Review cycle {cycle}/{self.max_review_cycles} …")
-            passed, feedback = self.reviewer.review_code()
+            log.info("[Orchestrator] Review cycle %d/%d …", cycle, self.max_review_cycles)
+            # The coder hands over the code it just wrote, so the reviewer does not re-read the spec file.
+            passed, feedback = await self.reviewer.areview_code(self.coder.code)
             if passed:
-                print("[Orchestrator] ✅ Test suite passed review!")
+                log.info("[Orchestrator] ✅ Test suite passed review!")
                 break
 
-            print("[Orchestrator] ❌ Review failed – feeding feedback back to coder agent …")
-            print("[Orchestrator] Reviewer feedback:\n" + feedback)
-            self.coder.improve_code(feedback)
+            log.info("[Orchestrator] ❌ Review failed – feeding feedback back to coder agent …")
+            log.info("[Orchestrator] Reviewer feedback:\n%s", feedback)
+            await self.coder.aimprove_code(feedback)
+            if not self.coder.code_changed:
+                log.warning("[Orchestrator] 🚨 Coder agent produced no new code – suite still failing, stopping the review loop.")
+                break
+            if self.coder.code_digest in reviewed_digests:
+                log.warning(
+                    "[Orchestrator] 🚨 Coder agent returned an already reviewed version – suite still failing, "
+                    "stopping the review loop."
+                )
+                break
+            reviewed_digests.add(self.coder.code_digest)
         else:
-            print("[Orchestrator] 🚨 Maximum review cycles reached – manual intervention required.")
+            log.warning("[Orchestrator] 🚨 Maximum review cycles reached – manual intervention required.")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="End-to-end QA Automation Orchestrator")
-    parser.add_argument("xml", help="Path to a TestRail XML export containing test cases")
+    parser.add_argument("xml", nargs="+", help="Path(s) to TestRail XML export(s) containing test cases")
     parser.add_argument(
         "--work-dir",
         default="artifacts",
@@ -90,11 +188,37 @@ if __name__ == "__main__":
         default=3,
         help="How many times the reviewer may return feedback before giving up",
     )
+    parser.add_argument("--shard-index", type=int, help="1-based Playwright shard to run on this machine")
+    parser.add_argument("--shard-total", type=int, help="Total number of Playwright shards")
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Convert several XML files via the OpenAI Batch API (cheaper, but may take up to 24h)",
+    )
+
+    parser.add_argument(
+        "--max-cases-per-chunk",
+        type=int,
+        help="Split a large XML export into parallel LLM requests of at most this many test cases (one XML only)",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Also stream the raw test-runner output")
 
     args = parser.parse_args()
+    if args.max_cases_per_chunk and len(args.xml) > 1:
+        parser.error("--max-cases-per-chunk can only be used with a single XML file")
+    # Only our own loggers speak at INFO; third-party ones (httpx, httpcore, h2 …) stay at WARNING.
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(message)s")
+    for name in (__name__, "Agents"):
+        logging.getLogger(name).setLevel(logging.INFO)
+    if args.verbose:
+        logging.getLogger(CodeReviewerAgent.__module__).setLevel(logging.DEBUG)
     Orchestrator(
-        xml_path=args.xml,
+        xml_paths=args.xml,
         work_dir=args.work_dir,
         model=args.model,
         max_review_cycles=args.max_review_cycles,
+        shard_index=args.shard_index,
+        shard_total=args.shard_total,
+        use_batch_api=args.batch_api,
+        max_cases_per_chunk=args.max_cases_per_chunk,
     ).run() 
\ No newline at end of file